@@ -1,11 +1,14 @@
 import uuid
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Response
+from sqlalchemy.orm import Session, selectinload
 from database import get_db
 from models.all_models import BatchJob, Campaign, CampaignPost
 from schemas.main import BatchGenerationRequest
+from services.admission_service import admission_controller
 from services.batch_service import BatchGenerationService
+from services.progress_service import ProgressSnapshot, progress_tracker
 from api.campaigns import get_current_user_id
 
 router = APIRouter(tags=["Batch Generation"])
@@ -22,11 +25,24 @@ async def start_batch_generation(
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found or access denied")
 
+    extra_caption_variants = sum(p.caption_variants - 1 for p in batch_request.posts)
+    decision = admission_controller.evaluate(db, len(batch_request.posts), extra_caption_variants)
+    if not decision.admitted:
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "message": "Generation backlog is full. Please retry later.",
+                **decision.to_dict()
+            },
+            headers={"Retry-After": str(decision.retry_after)}
+        )
+
     new_batch_job = BatchJob(
         user_id=user_id,
         campaign_id=campaign_id,
         name=batch_request.name,
         total_posts=len(batch_request.posts),
+        extra_caption_variants=extra_caption_variants,
         status='pending',
         started_at=datetime.now(timezone.utc)  # Track start time
     )
@@ -38,56 +54,67 @@ async def start_batch_generation(
     background_tasks.add_task(
         batch_service.process_batch,
         batch_job_id=new_batch_job.id,
-        posts_data=[p.dict() for p in batch_request.posts]
+        posts_data=decision.apply([p.dict() for p in batch_request.posts])
     )
-    return {"message": "Batch generation started.", "job_id": new_batch_job.id}
+    return {"message": "Batch generation started.", "job_id": new_batch_job.id, **decision.to_dict()}
+
+
+def _load_snapshot(job_id: uuid.UUID, db: Session) -> Optional[ProgressSnapshot]:
+    """
+    Returns the in-process snapshot when this worker can vouch for it, otherwise
+    reads the job's shared row (and caches it if the job has finished).
+    """
+    snapshot = progress_tracker.get(job_id)
+    if snapshot is None:
+        batch_job = db.query(BatchJob).filter(BatchJob.id == job_id).first()
+        if not batch_job:
+            return None
+        snapshot = ProgressSnapshot.from_job(batch_job)
+        progress_tracker.remember(snapshot)
+    return snapshot
 
 
 @router.get("/batch-jobs/{job_id}/status")
-def get_batch_status(job_id: uuid.UUID, db: Session = Depends(get_db)):
-    batch_job = db.query(BatchJob).filter(BatchJob.id == job_id).first()
-    if not batch_job:
+def get_batch_status(job_id: uuid.UUID, request: Request, response: Response, db: Session = Depends(get_db)):
+    snapshot = _load_snapshot(job_id, db)
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Batch job not found")
 
-    percentage = 0
-    if batch_job.total_posts > 0:
-        percentage = ((batch_job.completed_posts + batch_job.failed_posts) / batch_job.total_posts) * 100
-
-    # Calculate elapsed time
-    started_at = batch_job.started_at
-    completed_at = batch_job.completed_at
-    now = datetime.now(timezone.utc)
-    elapsed = None
-    if started_at:
-        if completed_at:
-            elapsed = (completed_at - started_at).total_seconds()
-        else:
-            elapsed = (now - started_at).total_seconds()
-
-    return {
-        'id': str(batch_job.id),
-        'status': batch_job.status,
-        'progress': {
-            'total': batch_job.total_posts,
-            'completed': batch_job.completed_posts,
-            'failed': batch_job.failed_posts,
-            'percentage': round(percentage, 1)
-        },
-        'started_at': started_at.isoformat() if started_at else None,
-        'completed_at': completed_at.isoformat() if completed_at else None,
-        'elapsed_seconds': round(elapsed, 2) if elapsed is not None else None
-    }
+    if snapshot.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=snapshot.cache_headers())
+
+    response.headers.update(snapshot.cache_headers())
+    return snapshot.to_status_dict()
+
+def _caption_variants(post: CampaignPost) -> List[str]:
+    if post.caption_variants:
+        return [variant.caption for variant in post.caption_variants]
+    # Posts generated before variants were stored only have the single caption.
+    if post.generation_status == 'completed' and post.caption:
+        return [post.caption]
+    return []
 
 @router.get("/batch-jobs/{job_id}/results")
-def get_batch_results(job_id: uuid.UUID, db: Session = Depends(get_db)):
-    posts = db.query(CampaignPost).filter(CampaignPost.batch_job_id == job_id).all()
+def get_batch_results(job_id: uuid.UUID, request: Request, response: Response, db: Session = Depends(get_db)):
+    # Read the validator before the posts, so the ETag is never newer than the body it tags.
+    snapshot = _load_snapshot(job_id, db)
+    if snapshot is not None and snapshot.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=snapshot.cache_headers())
+
+    posts = db.query(CampaignPost).options(selectinload(CampaignPost.caption_variants)).filter(
+        CampaignPost.batch_job_id == job_id
+    ).all()
     if not posts:
         raise HTTPException(status_code=404, detail="No posts found for this job or job does not exist.")
 
+    if snapshot is not None:
+        response.headers.update(snapshot.cache_headers())
+
     return [{
         "id": str(post.id),
         "title": post.title,
         "caption": post.caption,
+        "caption_variants": _caption_variants(post),
         "image_url": post.image_url,
         "status": post.generation_status
-    } for post in posts]
\ No newline at end of file
+    } for post in posts]
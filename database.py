@@ -5,13 +5,71 @@ import os
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Pool settings apply per worker process. Keep
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below Postgres' max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# The engine is created per worker by the app lifespan (see main.py), never at import,
+# so forked/spawned workers don't end up sharing sockets.
+engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
+def create_db_engine():
+    return create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+def init_engine():
+    global engine
+    if engine is None:
+        engine = create_db_engine()
+        SessionLocal.configure(bind=engine)
+    return engine
+
+def dispose_engine():
+    global engine
+    if engine is not None:
+        engine.dispose()
+        engine = None
+
+# Set by server.py once the schema has been created in the pre-fork step.
+SCHEMA_READY_ENV = "SCHEMA_SETUP_DONE"
+
+def create_schema(bind=None):
+    """
+    Creates missing tables. Models must be imported first so they are registered on Base.
+    Note: For production, it's better to use a migration tool like Alembic.
+    """
+    schema_engine = bind or create_db_engine()
+    try:
+        Base.metadata.create_all(bind=schema_engine)
+    finally:
+        if bind is None:
+            schema_engine.dispose()
+
+def pool_stats():
+    if engine is None:
+        return None
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
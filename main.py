@@ -2,19 +2,55 @@ from dotenv import load_dotenv
 # Load environment variables from .env file BEFORE any other imports
 load_dotenv()
 
+import time
+# Cold-start timing covers everything from here to the end of the lifespan startup.
+_import_started = time.perf_counter()
+
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+import database
 from api import auth, campaigns, batch
+from services.openai_service import openai_service
+
+worker_stats = {}
 
-# This will create tables if they don't exist.
-# Note: For production, it's better to use a migration tool like Alembic.
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_started = time.perf_counter()
+    engine = database.init_engine()
+    if os.getenv(database.SCHEMA_READY_ENV) != "1":
+        # Dev server (`uvicorn main:app`): no pre-fork step ran, so create tables here.
+        database.create_schema(bind=engine)
+    # Open the first pooled connection now so it isn't paid for by the first request.
+    with engine.connect():
+        pass
+    openai_service.start()
+
+    now = time.perf_counter()
+    worker_stats.update({
+        "pid": os.getpid(),
+        "cold_start_seconds": round(now - _import_started, 3),
+        "lifespan_startup_seconds": round(now - startup_started, 3),
+    })
+    print(
+        f"Worker {worker_stats['pid']} ready in {worker_stats['cold_start_seconds']}s "
+        f"(lifespan {worker_stats['lifespan_startup_seconds']}s), "
+        f"db pool {database.pool_stats()}, openai {openai_service.connection_stats()}"
+    )
+    try:
+        yield
+    finally:
+        await openai_service.close()
+        database.dispose_engine()
 
 app = FastAPI(
     title="Social Media Generator API",
     description="API for generating batch social media content using AI.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -34,28 +70,11 @@ app.include_router(batch.router, prefix="/api")
 async def health_check():
     return {"status": "healthy", "message": "API is running"}
 
-#
-# database.py (Corrected)
-#
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
-# No longer need dotenv here, main.py handles it.
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-# Add a check to ensure the URL was loaded
-if DATABASE_URL is None:
-    raise Exception("DATABASE_URL environment variable not set. Make sure you have a .env file.")
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+@app.get("/api/health/worker")
+async def worker_health():
+    """Per-worker cold-start timings and connection counts."""
+    return {
+        **worker_stats,
+        "database_pool": database.pool_stats(),
+        "openai_http": openai_service.connection_stats(),
+    }
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, Text, Integer, ForeignKey
+from sqlalchemy import Column, String, DateTime, Text, Integer, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -45,10 +45,15 @@ class BatchJob(Base):
     total_posts = Column(Integer, default=0)
     completed_posts = Column(Integer, default=0)
     failed_posts = Column(Integer, default=0)
+    # Caption variants requested beyond one per post; weighs the job's cost in admission control.
+    extra_caption_variants = Column(Integer, nullable=False, default=0)
     status = Column(String(20), default='pending', index=True)
+    # Bumped on every progress/status change; backs the ETag of the polling endpoints.
+    progress_version = Column(Integer, nullable=False, default=0)
     started_at = Column(DateTime(timezone=True))
     completed_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     user = relationship("User", back_populates="batch_jobs")
     posts = relationship("CampaignPost", back_populates="batch_job", cascade="all, delete-orphan")
 
@@ -64,5 +69,20 @@ class CampaignPost(Base):
     image_url = Column(String(500))
     generation_status = Column(String(20), default='pending')
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set once the post has an outcome; admission control measures throughput from it.
+    finished_at = Column(DateTime(timezone=True), index=True)
     campaign = relationship("Campaign", back_populates="posts")
-    batch_job = relationship("BatchJob", back_populates="posts")
\ No newline at end of file
+    batch_job = relationship("BatchJob", back_populates="posts")
+    caption_variants = relationship(
+        "CaptionVariant", back_populates="post", cascade="all, delete-orphan", order_by="CaptionVariant.position"
+    )
+
+class CaptionVariant(Base):
+    __tablename__ = "caption_variants"
+    __table_args__ = (UniqueConstraint('post_id', 'position'),)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    post_id = Column(UUID(as_uuid=True), ForeignKey('campaign_posts.id', ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    caption = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    post = relationship("CampaignPost", back_populates="caption_variants")
\ No newline at end of file
@@ -51,10 +51,13 @@ CREATE TABLE batch_jobs (
     total_posts INTEGER NOT NULL DEFAULT 0,
     completed_posts INTEGER NOT NULL DEFAULT 0,
     failed_posts INTEGER NOT NULL DEFAULT 0,
+    extra_caption_variants INTEGER NOT NULL DEFAULT 0,
     status VARCHAR(20) DEFAULT 'pending',
+    progress_version INTEGER NOT NULL DEFAULT 0,
     started_at TIMESTAMP WITH TIME ZONE,
     completed_at TIMESTAMP WITH TIME ZONE,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 -- Campaign posts (individual content)
@@ -68,10 +71,23 @@ CREATE TABLE campaign_posts (
     caption TEXT,
     image_url VARCHAR(500),
     generation_status VARCHAR(20) DEFAULT 'pending',
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Caption options generated for A/B testing (one row per variant)
+CREATE TABLE caption_variants (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    post_id UUID NOT NULL REFERENCES campaign_posts(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    caption TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    -- Also serves lookups by post_id
+    UNIQUE (post_id, position)
 );
 
 -- Performance indexes
 CREATE INDEX idx_campaigns_user_id ON campaigns(user_id);
 CREATE INDEX idx_batch_jobs_status ON batch_jobs(status);
-CREATE INDEX idx_campaign_posts_batch_job_id ON campaign_posts(batch_job_id);
\ No newline at end of file
+CREATE INDEX idx_campaign_posts_batch_job_id ON campaign_posts(batch_job_id);
+CREATE INDEX idx_campaign_posts_finished_at ON campaign_posts(finished_at);
\ No newline at end of file
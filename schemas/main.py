@@ -46,6 +46,7 @@ class PostGenerationInput(BaseModel):
     target_audience: Optional[str] = None
     generate_caption: bool = True
     generate_image: bool = True
+    caption_variants: int = Field(1, ge=1, le=5)
 
 class BatchGenerationRequest(BaseModel):
     name: str
@@ -0,0 +1,43 @@
+#
+# server.py
+#
+# Production entry point: `python server.py`.
+# Creates the schema once in the parent process, then starts the uvicorn workers.
+# Each worker builds its own database engine and OpenAI client in the app lifespan.
+#
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import time
+
+import uvicorn
+
+import models.all_models  # noqa: F401  (registers the tables on Base.metadata)
+from database import SCHEMA_READY_ENV, create_schema
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+KEEP_ALIVE_TIMEOUT = int(os.getenv("KEEP_ALIVE_TIMEOUT", "5"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+
+def main():
+    started = time.perf_counter()
+    create_schema()
+    print(f"Schema setup finished in {time.perf_counter() - started:.3f}s")
+
+    # Inherited by the workers so they skip their own create_all round trips.
+    os.environ[SCHEMA_READY_ENV] = "1"
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+        proxy_headers=True,
+        log_level=LOG_LEVEL,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import math
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.all_models import BatchJob, CampaignPost
+
+# Throughput assumed until enough posts have finished recently (~15 posts/min, see PERFORMANCE.md).
+ADMISSION_DEFAULT_THROUGHPUT = float(os.getenv("ADMISSION_DEFAULT_THROUGHPUT", "0.25"))  # posts/second
+# Estimated completion times (seconds) at which new bulk jobs are degraded, then rejected.
+ADMISSION_DEGRADE_AFTER = float(os.getenv("ADMISSION_DEGRADE_AFTER", "600"))
+ADMISSION_CAPTION_ONLY_AFTER = float(os.getenv("ADMISSION_CAPTION_ONLY_AFTER", "1200"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "1800"))
+# Batches this small are interactive: never degraded, and only rejected once their own
+# share of the throughput would take longer than ADMISSION_INTERACTIVE_MAX_WAIT.
+ADMISSION_INTERACTIVE_MAX_POSTS = int(os.getenv("ADMISSION_INTERACTIVE_MAX_POSTS", "10"))
+ADMISSION_INTERACTIVE_MAX_WAIT = float(os.getenv("ADMISSION_INTERACTIVE_MAX_WAIT", "300"))
+# Jobs left unfinished this long (e.g. after a crash) no longer count towards the backlog.
+ADMISSION_STALE_AFTER_HOURS = float(os.getenv("ADMISSION_STALE_AFTER_HOURS", "6"))
+ADMISSION_DEGRADED_IMAGE_MODEL = os.getenv("ADMISSION_DEGRADED_IMAGE_MODEL", "dall-e-2")
+ADMISSION_DEGRADED_IMAGE_SIZE = os.getenv("ADMISSION_DEGRADED_IMAGE_SIZE", "512x512")
+# Extra caption variants share their post's request but still spend output tokens;
+# each one counts as this fraction of a post, both for new jobs and for the backlog.
+ADMISSION_CAPTION_VARIANT_WEIGHT = float(os.getenv("ADMISSION_CAPTION_VARIANT_WEIGHT", "0.1"))
+
+# Throughput is measured over the posts with an image finished (by any worker) in this sliding window (seconds).
+THROUGHPUT_WINDOW = 300
+THROUGHPUT_MIN_SAMPLES = 10
+THROUGHPUT_MIN_SPAN = 60
+
+DEGRADATION_NONE = "none"
+DEGRADATION_REDUCED_IMAGE = "reduced_image"
+DEGRADATION_CAPTION_ONLY = "caption_only"
+
+
+@dataclass(frozen=True)
+class AdmissionDecision:
+    admitted: bool
+    degradation: str
+    backlog_posts: float
+    estimated_seconds: float
+    retry_after: Optional[int] = None
+
+    def apply(self, posts_data: List[Dict]) -> List[Dict]:
+        """Rewrites the per-post generation options according to the degradation level."""
+        for post_data in posts_data:
+            if self.degradation == DEGRADATION_REDUCED_IMAGE:
+                post_data['image_model'] = ADMISSION_DEGRADED_IMAGE_MODEL
+                post_data['image_size'] = ADMISSION_DEGRADED_IMAGE_SIZE
+            elif self.degradation == DEGRADATION_CAPTION_ONLY:
+                post_data['generate_image'] = False
+        return posts_data
+
+    def to_dict(self) -> Dict:
+        completion = datetime.now(timezone.utc) + timedelta(seconds=self.estimated_seconds)
+        return {
+            'backlog_posts': round(self.backlog_posts, 1),
+            'estimated_completion_seconds': round(self.estimated_seconds, 1),
+            'estimated_completion_at': completion.isoformat(),
+            'degradation': self.degradation,
+        }
+
+
+class AdmissionController:
+    """
+    Estimates when a new batch would finish from the posts still queued in
+    `batch_jobs` and the posts recently finished in `campaign_posts`, and decides
+    whether to accept it as is, accept it degraded, or reject it. Both come from
+    the database, so every worker sees the same fleet-wide numbers.
+    """
+    def throughput(self, db: Session) -> float:
+        """
+        Posts per second completed across all workers over the last THROUGHPUT_WINDOW.
+        Only completed posts with an image count: failed and caption-only posts finish
+        much faster and would make the fleet look faster than it is under load.
+        """
+        finished, span = db.query(
+            func.count(CampaignPost.id),
+            func.extract('epoch', func.now() - func.min(CampaignPost.finished_at))
+        ).filter(
+            CampaignPost.finished_at >= func.now() - timedelta(seconds=THROUGHPUT_WINDOW),
+            CampaignPost.generation_status == 'completed',
+            CampaignPost.image_url.isnot(None)
+        ).one()
+        if finished < THROUGHPUT_MIN_SAMPLES:
+            return ADMISSION_DEFAULT_THROUGHPUT
+        return finished / max(float(span or 0), THROUGHPUT_MIN_SPAN)
+
+    def work(self, posts: float, extra_caption_variants: float = 0) -> float:
+        """Cost of generating `posts` posts, in post units."""
+        return posts + extra_caption_variants * ADMISSION_CAPTION_VARIANT_WEIGHT
+
+    def current_backlog(self, db: Session) -> Tuple[float, int]:
+        """
+        Returns (unfinished work in post units, active jobs) across all workers. A job's
+        extra caption variants are spread evenly over its posts.
+        """
+        stale_before = datetime.now(timezone.utc) - timedelta(hours=ADMISSION_STALE_AFTER_HOURS)
+        remaining = BatchJob.total_posts - BatchJob.completed_posts - BatchJob.failed_posts
+        remaining_variants = remaining * BatchJob.extra_caption_variants / func.nullif(BatchJob.total_posts, 0)
+        backlog, active_jobs = db.query(
+            func.coalesce(func.sum(remaining * 1.0 + remaining_variants * ADMISSION_CAPTION_VARIANT_WEIGHT), 0),
+            func.count(BatchJob.id)
+        ).filter(
+            BatchJob.status.in_(('pending', 'processing')),
+            BatchJob.created_at >= stale_before
+        ).one()
+        return max(float(backlog), 0.0), int(active_jobs)
+
+    def evaluate(self, db: Session, new_posts: int, extra_caption_variants: int = 0) -> AdmissionDecision:
+        backlog, active_jobs = self.current_backlog(db)
+        throughput = self.throughput(db)
+        new_work = self.work(new_posts, extra_caption_variants)
+
+        if new_posts <= ADMISSION_INTERACTIVE_MAX_POSTS:
+            # Every batch starts right away in its own background task, so a small batch
+            # doesn't wait behind the backlog; it gets a share of the upstream throughput.
+            # That share still shrinks with every active job, so floods of small batches get a 429.
+            estimated = new_work * (active_jobs + 1) / throughput
+            if estimated > ADMISSION_INTERACTIVE_MAX_WAIT and active_jobs > 0:
+                return self._reject(backlog, estimated, ADMISSION_INTERACTIVE_MAX_WAIT, throughput)
+            return AdmissionDecision(True, DEGRADATION_NONE, backlog, estimated)
+
+        estimated = (backlog + new_work) / throughput
+        if estimated > ADMISSION_MAX_WAIT and backlog > 0:
+            # A job too large to ever fit is admitted (degraded) once the backlog is empty.
+            return self._reject(backlog, estimated, ADMISSION_MAX_WAIT, throughput)
+
+        degradation = DEGRADATION_NONE
+        if estimated > ADMISSION_CAPTION_ONLY_AFTER:
+            degradation = DEGRADATION_CAPTION_ONLY
+        elif estimated > ADMISSION_DEGRADE_AFTER:
+            degradation = DEGRADATION_REDUCED_IMAGE
+        return AdmissionDecision(True, degradation, backlog, estimated)
+
+    def _reject(self, backlog: float, estimated: float, limit: float, throughput: float) -> AdmissionDecision:
+        # Come back once enough of the backlog has drained for this job to fit.
+        retry_after = max(1, math.ceil(min(estimated - limit, backlog / throughput)))
+        return AdmissionDecision(False, DEGRADATION_NONE, backlog, estimated, retry_after)
+
+
+# Global instance shared by the batch endpoints and the batch service
+admission_controller = AdmissionController()
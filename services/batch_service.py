@@ -1,14 +1,19 @@
 import asyncio
 import uuid
 from asyncio import Semaphore
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime, timezone
+from sqlalchemy import func, insert, update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 from database import SessionLocal
-from models.all_models import BatchJob, CampaignPost
+from models.all_models import BatchJob, CampaignPost, CaptionVariant
 from services.openai_service import openai_service
+from services.progress_service import progress_tracker
+
+async def _skipped():
+    return None
 
 class BatchGenerationService:
     def __init__(self):
@@ -37,12 +42,14 @@ class BatchGenerationService:
                 generation_status='generating',
             )
             db.add(post)
+            version, updated_at = self._bump_progress(db, batch_job_id)
             db.commit()
             db.refresh(post)
+            progress_tracker.touch(batch_job_id, version, updated_at)
 
-            # 2. Generate content concurrently
-            caption_task = openai_service.generate_caption(post_data)
-            image_task = openai_service.generate_image(post_data)
+            # 2. Generate content concurrently (either part may be switched off, e.g. under load)
+            caption_task = openai_service.generate_captions(post_data) if post_data.get('generate_caption', True) else _skipped()
+            image_task = openai_service.generate_image(post_data) if post_data.get('generate_image', True) else _skipped()
             results = await asyncio.gather(caption_task, image_task, return_exceptions=True)
             caption_result, image_result = results
 
@@ -53,8 +60,13 @@ class BatchGenerationService:
             if caption_failed:
                 post.caption = f"Caption generation failed: {caption_result}"
                 print(f"Error generating caption for post '{post.title}': {caption_result}")
-            else:
-                post.caption = caption_result
+            elif caption_result is not None:
+                post.caption = caption_result[0]
+                # Every option, the first included, goes in with a single multi-row INSERT
+                db.execute(insert(CaptionVariant), [
+                    {'post_id': post.id, 'position': position, 'caption': caption}
+                    for position, caption in enumerate(caption_result)
+                ])
 
             if image_failed:
                 # Use a placeholder URL on failure for a better frontend experience
@@ -64,17 +76,12 @@ class BatchGenerationService:
                 post.image_url = image_result
             
             # 4. Finalize status and update batch job counters atomically
-            if caption_failed or image_failed:
-                post.generation_status = 'failed'
-                db.query(BatchJob).filter(BatchJob.id == batch_job_id).update(
-                    {'failed_posts': BatchJob.failed_posts + 1}, synchronize_session=False
-                )
-            else:
-                post.generation_status = 'completed'
-                db.query(BatchJob).filter(BatchJob.id == batch_job_id).update(
-                    {'completed_posts': BatchJob.completed_posts + 1}, synchronize_session=False
-                )
+            post_failed = caption_failed or image_failed
+            post.generation_status = 'failed' if post_failed else 'completed'
+            post.finished_at = func.now()
+            version, updated_at = self._bump_progress(db, batch_job_id, failed=post_failed)
             db.commit()
+            progress_tracker.record_post(batch_job_id, post_failed, version, updated_at)
 
         except Exception as e:
             # This block catches ANY exception during the process, including DB errors (SQLAlchemyError).
@@ -86,13 +93,31 @@ class BatchGenerationService:
             if post and post.id:
                 post.generation_status = 'failed'
                 post.caption = f"Post processing failed: {str(e)[:500]}"
+                post.finished_at = func.now()
 
             # CRITICAL: No matter the error, increment the failed counter.
             # This ensures progress tracking is always accurate.
-            db.query(BatchJob).filter(BatchJob.id == batch_job_id).update(
-                {'failed_posts': BatchJob.failed_posts + 1}, synchronize_session=False
-            )
+            version, updated_at = self._bump_progress(db, batch_job_id, failed=True)
             db.commit()
+            progress_tracker.record_post(batch_job_id, True, version, updated_at)
+
+    def _bump_progress(self, db: Session, batch_job_id: uuid.UUID, failed: Optional[bool] = None):
+        """
+        Bumps the progress version (and the completed/failed counter once a post
+        has an outcome), so pollers on other workers can tell the job has changed.
+        Returns the new (progress_version, updated_at) as stored in the row.
+        """
+        values = {BatchJob.progress_version: BatchJob.progress_version + 1}
+        if failed is not None:
+            counter = BatchJob.failed_posts if failed else BatchJob.completed_posts
+            values[counter] = counter + 1
+        statement = (
+            update(BatchJob)
+            .where(BatchJob.id == batch_job_id)
+            .values(values)
+            .returning(BatchJob.progress_version, BatchJob.updated_at)
+        )
+        return db.execute(statement, execution_options={"synchronize_session": False}).one()
 
     async def process_batch(self, batch_job_id: uuid.UUID, posts_data: List[Dict]):
         """
@@ -107,7 +132,9 @@ class BatchGenerationService:
 
             batch_job.status = "processing"
             batch_job.started_at = datetime.now(timezone.utc)
+            batch_job.progress_version = BatchJob.progress_version + 1
             db.commit()
+            progress_tracker.start(batch_job)
 
             semaphore = Semaphore(self.max_concurrent)
 
@@ -127,9 +154,13 @@ class BatchGenerationService:
             else:
                 batch_job.status = "completed"
             batch_job.completed_at = datetime.now(timezone.utc)
+            batch_job.progress_version = BatchJob.progress_version + 1
             db.commit()
+            progress_tracker.finish(batch_job)
 
             print(f"Batch job {batch_job_id} completed. Success: {batch_job.completed_posts}, Failed: {batch_job.failed_posts}")
 
         finally:
+            # Never keep serving a stale in-memory snapshot if processing aborted.
+            progress_tracker.release(batch_job_id)
             db.close() # IMPORTANT: Close the single session when the batch is finished
@@ -1,15 +1,83 @@
 import asyncio
+import httpx
 import openai
 import os
 import random
-from typing import Dict
+from typing import Dict, List, Optional
+
+# Connection limits apply per worker process.
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "true").lower() in ("1", "true", "yes")
+
+# dall-e-2 rejects prompts longer than this (dall-e-3 allows 4000).
+DALL_E_2_MAX_PROMPT_LENGTH = 1000
 
 class OpenAIService:
     def __init__(self):
-        self.client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self._client: Optional[openai.AsyncOpenAI] = None
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self.http2 = False
         self.max_retries = 4  # Lowered for speed
 
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        # Built by the app lifespan in each worker, or lazily for standalone scripts.
+        if self._client is None:
+            self.start()
+        return self._client
+
+    def start(self):
+        if self._client is not None:
+            return
+        self.http2 = OPENAI_HTTP2
+        if self.http2:
+            try:
+                import h2  # noqa: F401  (optional, required by httpx for HTTP/2)
+            except ImportError:
+                print("OPENAI_HTTP2 is enabled but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+                self.http2 = False
+        self._transport = httpx.AsyncHTTPTransport(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+            ),
+        )
+        self._client = openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(transport=self._transport, timeout=OPENAI_TIMEOUT),
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+        self._client = None
+        self._transport = None
+
+    def connection_stats(self) -> Dict:
+        # httpx doesn't expose its pool publicly, so the open connection count is best effort.
+        pool = getattr(self._transport, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return {
+            "http2": self.http2,
+            "max_connections": OPENAI_MAX_CONNECTIONS,
+            "max_keepalive_connections": OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            "open_connections": len(connections) if connections is not None else None,
+        }
+
     async def generate_caption(self, campaign_data: Dict) -> str:
+        return (await self.generate_captions(campaign_data, n=1))[0]
+
+    async def generate_captions(self, campaign_data: Dict, n: Optional[int] = None) -> List[str]:
+        """
+        Generates `n` caption options (default: the post's `caption_variants`) in a
+        single chat completion request.
+        """
+        n = n or campaign_data.get('caption_variants') or 1
         prompt = f"""
         Create an engaging Instagram caption for the brand '{campaign_data['brand_name']}'.
         Topic: {campaign_data.get('topic', 'General brand content')}
@@ -29,11 +97,13 @@ class OpenAIService:
                 response = await self.client.chat.completions.create(
                     model=os.getenv("OPENAI_CAPTION_MODEL", "gpt-4o-mini"),
                     messages=[{"role": "user", "content": prompt}],
-                    max_tokens=300,  # Lowered for speed
-                    temperature=0.4
+                    max_tokens=300,  # Lowered for speed, applies per choice
+                    # More variety between variants, otherwise A/B options come out near-identical
+                    temperature=0.4 if n == 1 else 0.8,
+                    n=n
                 )
                 await asyncio.sleep(0.5)  # Add a small delay after success
-                return response.choices[0].message.content.strip()
+                return [choice.message.content.strip() for choice in response.choices]
             except openai.RateLimitError as e:
                 base = 2 ** attempt
                 jitter = random.uniform(0, 1)
@@ -45,20 +115,31 @@ class OpenAIService:
                 raise
         raise Exception("Caption generation failed after retries.")
 
-    async def generate_image(self, campaign_data: Dict) -> str:
-        image_prompt = f"""
+    def _image_prompt(self, campaign_data: Dict, brief: str) -> str:
+        return f"""
         A professional, high-quality, vibrant Instagram post image for the brand '{campaign_data['brand_name']}'.
         The image should visually represent the topic: '{campaign_data.get('topic', 'Brand content')}'
         The style should be {campaign_data['tone']} and visually appealing to {campaign_data.get('target_audience', 'a general audience')}.
-        Brief: {campaign_data.get('brief', '')}
+        Brief: {brief}
         Key elements to include: High quality, 1:1 aspect ratio. No text on the image.
         """
+
+    async def generate_image(self, campaign_data: Dict) -> str:
+        # Admission control may pick a faster model/size for jobs admitted under load
+        model = campaign_data.get('image_model') or os.getenv("OPENAI_IMAGE_MODEL", "dall-e-3")
+        brief = campaign_data.get('brief', '')
+        image_prompt = self._image_prompt(campaign_data, brief)
+        if model == "dall-e-2" and len(image_prompt) > DALL_E_2_MAX_PROMPT_LENGTH:
+            # Shorten the brief first; cut the prompt itself only if topic/audience are too long as well.
+            overflow = len(image_prompt) - DALL_E_2_MAX_PROMPT_LENGTH
+            image_prompt = self._image_prompt(campaign_data, brief[:max(len(brief) - overflow, 0)])
+            image_prompt = image_prompt[:DALL_E_2_MAX_PROMPT_LENGTH]
         for attempt in range(self.max_retries):
             try:
                 response = await self.client.images.generate(
-                    model=os.getenv("OPENAI_IMAGE_MODEL", "dall-e-3"),
+                    model=model,
                     prompt=image_prompt,
-                    size="1024x1024",
+                    size=campaign_data.get('image_size', "1024x1024"),
                     quality="standard",
                     n=1,
                 )
@@ -75,5 +156,6 @@ class OpenAIService:
                 raise
         raise Exception("Image generation failed after retries.")
 
-# Global instance to be used across the application
+# Global instance to be used across the application. Its HTTP client is created
+# per worker process in the app lifespan, not at import time.
 openai_service = OpenAIService()
\ No newline at end of file
@@ -0,0 +1,177 @@
+import math
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Dict, Optional
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Polling hints (seconds) sent back to clients in the Retry-After header.
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 30
+DEFAULT_RETRY_AFTER = 2
+# Aim for roughly this many polls over the expected remaining time of a job.
+POLLS_PER_JOB = 10
+
+
+@dataclass(frozen=True)
+class ProgressSnapshot:
+    """
+    Immutable view of a batch job's progress. `version` mirrors
+    `batch_jobs.progress_version` and changes whenever the counters or status do.
+    """
+    job_id: uuid.UUID
+    status: str
+    total: int
+    completed: int
+    failed: int
+    version: int
+    started_at: Optional[datetime]
+    completed_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_job(cls, batch_job) -> "ProgressSnapshot":
+        return cls(
+            job_id=batch_job.id,
+            status=batch_job.status,
+            total=batch_job.total_posts or 0,
+            completed=batch_job.completed_posts or 0,
+            failed=batch_job.failed_posts or 0,
+            version=batch_job.progress_version or 0,
+            started_at=batch_job.started_at,
+            completed_at=batch_job.completed_at,
+            updated_at=batch_job.updated_at or batch_job.completed_at or batch_job.started_at or batch_job.created_at,
+        )
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    @property
+    def etag(self) -> str:
+        # Weak validator: elapsed_seconds in the body keeps ticking between versions.
+        return f'W/"{self.job_id}-{self.version}"'
+
+    def elapsed_seconds(self, now: Optional[datetime] = None) -> Optional[float]:
+        if not self.started_at:
+            return None
+        end = self.completed_at or now or datetime.now(timezone.utc)
+        return (end - self.started_at).total_seconds()
+
+    def retry_after(self, now: Optional[datetime] = None) -> Optional[int]:
+        """Seconds a client should wait before polling again, or None once the job is done."""
+        if self.is_terminal:
+            return None
+        done = self.completed + self.failed
+        elapsed = self.elapsed_seconds(now)
+        if done == 0 or not elapsed:
+            return DEFAULT_RETRY_AFTER
+        remaining = elapsed / done * max(self.total - done, 0)
+        return max(MIN_RETRY_AFTER, min(MAX_RETRY_AFTER, math.ceil(remaining / POLLS_PER_JOB)))
+
+    def cache_headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.updated_at:
+            headers["Last-Modified"] = format_datetime(self.updated_at.astimezone(timezone.utc), usegmt=True)
+        retry_after = self.retry_after()
+        if retry_after is not None:
+            headers["Retry-After"] = str(retry_after)
+        return headers
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Weak comparison of an If-None-Match header against this snapshot's ETag."""
+        if not if_none_match:
+            return False
+        own = self.etag[2:]
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == "*" or tag == own:
+                return True
+        return False
+
+    def to_status_dict(self) -> Dict:
+        percentage = 0
+        if self.total > 0:
+            percentage = ((self.completed + self.failed) / self.total) * 100
+        elapsed = self.elapsed_seconds()
+        return {
+            'id': str(self.job_id),
+            'status': self.status,
+            'progress': {
+                'total': self.total,
+                'completed': self.completed,
+                'failed': self.failed,
+                'percentage': round(percentage, 1)
+            },
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'elapsed_seconds': round(elapsed, 2) if elapsed is not None else None
+        }
+
+
+class ProgressTracker:
+    """
+    In-process registry of progress snapshots.
+
+    Jobs running in this worker are tracked here as they progress, so their
+    snapshots are authoritative and polls can be answered without touching the
+    database. Finished jobs never change again, so their snapshots are kept too
+    (bounded by `max_finished`). Anything else must be read from `batch_jobs`.
+
+    Versions and timestamps are always taken from the bumped `batch_jobs` row, so
+    every worker sends the same ETag and Last-Modified for the same state.
+    """
+    def __init__(self, max_finished: int = 1000):
+        self.max_finished = max_finished
+        self._running: Dict[uuid.UUID, ProgressSnapshot] = {}
+        self._finished: "OrderedDict[uuid.UUID, ProgressSnapshot]" = OrderedDict()
+
+    def get(self, job_id: uuid.UUID) -> Optional[ProgressSnapshot]:
+        return self._running.get(job_id) or self._finished.get(job_id)
+
+    def remember(self, snapshot: ProgressSnapshot):
+        """Cache a snapshot loaded from the database if it can no longer change."""
+        if snapshot.is_terminal:
+            self._store_finished(snapshot)
+
+    def start(self, batch_job):
+        self._running[batch_job.id] = ProgressSnapshot.from_job(batch_job)
+
+    def touch(self, job_id: uuid.UUID, version: int, updated_at: datetime):
+        """A post was added to the job; its results changed but the counters did not."""
+        snapshot = self._running.get(job_id)
+        if snapshot is not None:
+            self._running[job_id] = replace(snapshot, version=version, updated_at=updated_at)
+
+    def record_post(self, job_id: uuid.UUID, failed: bool, version: int, updated_at: datetime):
+        snapshot = self._running.get(job_id)
+        if snapshot is None:
+            return
+        if failed:
+            snapshot = replace(snapshot, failed=snapshot.failed + 1)
+        else:
+            snapshot = replace(snapshot, completed=snapshot.completed + 1)
+        self._running[job_id] = replace(snapshot, version=version, updated_at=updated_at)
+
+    def finish(self, batch_job):
+        self._running.pop(batch_job.id, None)
+        self._store_finished(ProgressSnapshot.from_job(batch_job))
+
+    def release(self, job_id: uuid.UUID):
+        """Stop serving a running job from memory, e.g. after the worker gave up on it."""
+        self._running.pop(job_id, None)
+
+    def _store_finished(self, snapshot: ProgressSnapshot):
+        self._finished[snapshot.job_id] = snapshot
+        self._finished.move_to_end(snapshot.job_id)
+        while len(self._finished) > self.max_finished:
+            self._finished.popitem(last=False)
+
+
+# Global instance shared by the batch service and the polling endpoints
+progress_tracker = ProgressTracker()